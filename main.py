@@ -13,6 +13,8 @@ from scraper.logger import Logger
 from scraper.driver import WebDriverFactory
 from scraper.parsers import AcademicParser
 from scraper.exporter import DataExporter
+from scraper.profiler import ScrapingProfiler
+from scraper.scheduler import RefreshScheduler
 
 class ScraperOrchestrator:
     def __init__(self):
@@ -35,6 +37,26 @@ class ScraperOrchestrator:
         self.driver = None
         self.dados_coletados = []
 
+        # Profiling opcional: PROFILING=amostra|etapas e/ou PROFILING_LIMITE_SEG > 0
+        self.profiler = ScrapingProfiler(
+            modo=os.getenv('PROFILING', ''),
+            limite_lento_seg=float(os.getenv('PROFILING_LIMITE_SEG', '0') or 0),
+            logger=self.logger
+        )
+        # Definido apenas nas execuções agendadas (processar_cpfs_agendado)
+        self.agendador = None
+
+        # Sincronização com Google Sheets durante a coleta (opcional, dispensa o sync_sheets.py)
+        self.sincronizador = None
+        if os.getenv('SHEETS_SYNC_STREAM', '').strip().lower() in ('1', 'true', 'sim'):
+            from sync_sheets import SheetsStreamSync
+            self.sincronizador = SheetsStreamSync(
+                DataExporter([], self.system_choice, self.logger),
+                logger=self.logger,
+                intervalo_seg=float(os.getenv('SHEETS_SYNC_INTERVALO_SEG', '120')),
+                idade_max_snapshot_seg=float(os.getenv('SHEETS_SNAPSHOT_MAX_SEG', '3600'))
+            )
+
     def login(self):
         login_url = f"{self.url_sistema}/administracao/paginaInicial.php"
         self.logger.log(f"Acessando página de login: {login_url}")
@@ -112,41 +134,92 @@ class ScraperOrchestrator:
             'metodo_processamento': metodo
         }
 
-    def processar_cpfs_completo(self, cpfs):
+    def processar_cpfs_agendado(self, cpfs, limite_cpfs=None, limite_tempo_seg=None):
+        """Processamento completo apenas dos CPFs mais propensos a estarem desatualizados"""
+        meses = os.getenv('REMATRICULA_MESES', '1,2,7,8')
+        self.agendador = RefreshScheduler(
+            meses_rematricula=[int(m) for m in meses.split(',') if m.strip()],
+            logger=self.logger
+        )
+        selecionados = self.agendador.selecionar(cpfs, limite_cpfs, limite_tempo_seg)
+        try:
+            self.processar_cpfs_completo(selecionados, limite_tempo_seg)
+        finally:
+            self.agendador.salvar()
+            self.agendador = None
+
+    def processar_cpfs_completo(self, cpfs, limite_tempo_seg=None):
         """Processamento completo: Acadêmico + Financeiro"""
         self.driver = WebDriverFactory.criar_driver("chrome")
+        self.profiler.iniciar_execucao()
+        inicio_execucao = time.time()
         try:
             if not self.login():
                 return
 
             for i, cpf in enumerate(cpfs, 1):
+                if limite_tempo_seg and time.time() - inicio_execucao > limite_tempo_seg:
+                    self.logger.log(f"⏹ Orçamento de tempo esgotado após {i - 1}/{len(cpfs)} CPFs")
+                    break
+
                 self.logger.log(f"\n[{i}/{len(cpfs)}] PROCESSANDO COMPLETO CPF: {cpf}")
                 dados_aluno = self._obter_dicionario_base(cpf, "COMPLETO")
+                grupos_coletados = []
+                inicio_cpf = time.time()
+                self.profiler.iniciar_cpf(cpf)
 
-                # 1. Fluxo Acadêmico (Ficha + Histórico)
-                if self._buscar_ficha_academica(cpf):
-                    dados_aluno.update(AcademicParser.extrair_dados_pessoais(self.driver.page_source))
-                    dados_aluno.update(AcademicParser.extrair_vinculos_academicos(self.driver.page_source))
-                    
-                    if self._ir_para_historico():
-                        dados_aluno.update(AcademicParser.extrair_dados_historico(self.driver.page_source))
-                
-                # 2. Fluxo Financeiro (Email, Celular, Situação, Data Confirmação)
-                dados_fin = self._processar_financeiro_individual(cpf)
-                dados_aluno.update(dados_fin)
+                try:
+                    # 1. Fluxo Acadêmico (Ficha + Histórico)
+                    with self.profiler.etapa('ficha_academica'):
+                        ficha_ok = self._buscar_ficha_academica(cpf)
+                    if ficha_ok:
+                        grupos_coletados.append('vinculos')
+                        html = self.driver.page_source
+                        self.profiler.registrar_html('ficha_academica', html)
+                        with self.profiler.etapa('parser.extrair_dados_pessoais'):
+                            dados_aluno.update(AcademicParser.extrair_dados_pessoais(html))
+                        with self.profiler.etapa('parser.extrair_vinculos_academicos'):
+                            dados_aluno.update(AcademicParser.extrair_vinculos_academicos(html))
+
+                        with self.profiler.etapa('historico'):
+                            historico_ok = self._ir_para_historico()
+                        if historico_ok:
+                            grupos_coletados.append('historico')
+                            html = self.driver.page_source
+                            self.profiler.registrar_html('historico', html)
+                            with self.profiler.etapa('parser.extrair_dados_historico'):
+                                dados_aluno.update(AcademicParser.extrair_dados_historico(html))
+
+                    # 2. Fluxo Financeiro (Email, Celular, Situação, Data Confirmação)
+                    with self.profiler.etapa('financeiro'):
+                        dados_fin = self._processar_financeiro_individual(cpf)
+                    dados_aluno.update(dados_fin)
+                    if any(dados_fin.values()):
+                        grupos_coletados.append('financeiro')
+                finally:
+                    self.profiler.finalizar_cpf()
 
-                self.dados_coletados.append(dados_aluno)
+                if self.agendador:
+                    # Sem ficha acadêmica o histórico não chega a ser tentado
+                    grupos_tentados = ['vinculos', 'financeiro'] + (['historico'] if ficha_ok else [])
+                    self.agendador.registrar(dados_aluno, grupos_coletados, time.time() - inicio_cpf,
+                                             grupos_tentados=grupos_tentados)
+                self._registrar_aluno(dados_aluno)
                 self.logger.log(f"✓ Aluno concluído: {dados_aluno.get('nome', 'N/A')}")
 
             self._finalizar()
 
         finally:
+            self.profiler.finalizar_execucao()
+            if self.sincronizador:
+                self.sincronizador.fechar()
             if self.driver:
                 self.driver.quit()
 
     def processar_apenas_financeiro(self, cpfs):
         """Processamento otimizado: Apenas dados financeiros"""
         self.driver = WebDriverFactory.criar_driver("chrome")
+        self.profiler.iniciar_execucao()
         try:
             if not self.login():
                 return
@@ -154,15 +227,23 @@ class ScraperOrchestrator:
             for i, cpf in enumerate(cpfs, 1):
                 self.logger.log(f"\n[{i}/{len(cpfs)}] FINANCEIRO CPF: {cpf}")
                 dados_aluno = self._obter_dicionario_base(cpf, "FINANCEIRO")
+                self.profiler.iniciar_cpf(cpf)
+
+                try:
+                    with self.profiler.etapa('financeiro'):
+                        dados_fin = self._processar_financeiro_individual(cpf)
+                    dados_aluno.update(dados_fin)
+                finally:
+                    self.profiler.finalizar_cpf()
                 
-                dados_fin = self._processar_financeiro_individual(cpf)
-                dados_aluno.update(dados_fin)
-                
-                self.dados_coletados.append(dados_aluno)
+                self._registrar_aluno(dados_aluno)
 
             self._finalizar()
 
         finally:
+            self.profiler.finalizar_execucao()
+            if self.sincronizador:
+                self.sincronizador.fechar()
             if self.driver:
                 self.driver.quit()
 
@@ -183,6 +264,7 @@ class ScraperOrchestrator:
             return True
         except Exception as e:
             self.logger.log(f"✗ Erro ao buscar ficha acadêmica para {cpf}: {e}")
+            self._capturar_falha('ficha_academica', e)
             return False
 
     def _ir_para_historico(self):
@@ -197,6 +279,7 @@ class ScraperOrchestrator:
             return True
         except Exception as e:
             self.logger.log(f"✗ Erro ao ir para histórico: {e}")
+            self._capturar_falha('historico', e)
             return False
 
     def _processar_financeiro_individual(self, cpf):
@@ -244,9 +327,13 @@ class ScraperOrchestrator:
                     EC.presence_of_element_located((By.CLASS_NAME, "tabela_relatorio"))
                 )
                 
-                return AcademicParser.extrair_dados_financeiros(self.driver.page_source)
+                html = self.driver.page_source
+                self.profiler.registrar_html('financeiro', html)
+                with self.profiler.etapa('parser.extrair_dados_financeiros'):
+                    return AcademicParser.extrair_dados_financeiros(html)
         except Exception as e:
             self.logger.log(f"✗ Erro no fluxo financeiro para {cpf}: {e}")
+            self._capturar_falha('financeiro', e)
         
         return {
             'email_financeiro': '', 
@@ -255,10 +342,27 @@ class ScraperOrchestrator:
             'data_matricula_conf': ''
         }
 
+    def _registrar_aluno(self, dados_aluno):
+        self.dados_coletados.append(dados_aluno)
+        if self.sincronizador:
+            self.sincronizador.adicionar(dados_aluno)
+
+    def _capturar_falha(self, pagina, erro):
+        """Registra a exceção e o HTML da página no momento da falha (apenas com profiling ativo)"""
+        if not self.profiler.ativo:
+            return
+        self.profiler.registrar_erro(pagina, erro)
+        try:
+            self.profiler.registrar_html(f"{pagina}_erro", self.driver.page_source)
+        except Exception:
+            pass
+
     def _finalizar(self):
         exporter = DataExporter(self.dados_coletados, self.system_choice, self.logger)
         exporter.salvar_csv()
         exporter.salvar_excel()
+        if os.getenv('EXPORTAR_PARQUET', '').strip().lower() in ('1', 'true', 'sim'):
+            exporter.salvar_parquet()
         self.logger.log("\n✓ PROCESSAMENTO CONCLUÍDO!")
 
 if __name__ == "__main__":
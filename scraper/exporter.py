@@ -3,6 +3,11 @@ from pathlib import Path
 from datetime import datetime
 
 class DataExporter:
+    # Colunas tipadas no export Parquet (as demais são gravadas como texto)
+    COLUNAS_DATA = ('data_matricula', 'data_matricula_conf', 'data_ultima_rematricula')
+    # Inteiros: valores fracionários (ex.: '12,5' horas) são rejeitados e registrados no log, sem arredondar
+    COLUNAS_INTEIRAS = ('horas_extensao', 'qtde_horas_complementares', 'ano_ingresso')
+
     def __init__(self, dados_coletados, unidade='USJT', logger=None):
         self.dados = dados_coletados
         self.unidade = unidade
@@ -39,29 +44,37 @@ class DataExporter:
         
         # Adiciona dados seguindo o mapeamento de posições
         for _, row in df.iterrows():
-            linha = {
-                0: agora,
-                1: str(row.get('nome', '')),
-                2: str(row.get('cpf', '')),
-                3: self.unidade, 
-                4: str(row.get('forma_ingresso_vinculos', '')),
-                5: str(row.get('data_matricula_conf', row.get('data_matricula', ''))),
-                6: str(row.get('matricula', '')),
-                7: str(row.get('email', '')),
-                8: str(row.get('celular_financeiro', '')),
-                9: str(row.get('status_matricula', '')),
-                10: str(row.get('rematricula_recente', '')),
-                11: str(row.get('data_ultima_rematricula', '')),
-                12: str(row.get('horas_extensao', '')),
-                13: str(row.get('qtde_horas_complementares', '')),
-                14: str(row.get('email_financeiro', '')),
-                15: str(row.get('situacao_academica', '')),
-                16: str(row.get('metodo_processamento', ''))
-            }
-            dados_reordenados.append(linha)
+            dados_reordenados.append(self._montar_linha(row, agora))
         
         return pd.DataFrame(dados_reordenados)
 
+    def _montar_linha(self, row, agora):
+        return {
+            0: agora,
+            1: str(row.get('nome', '')),
+            2: str(row.get('cpf', '')),
+            3: self.unidade, 
+            4: str(row.get('forma_ingresso_vinculos', '')),
+            5: str(row.get('data_matricula_conf', row.get('data_matricula', ''))),
+            6: str(row.get('matricula', '')),
+            7: str(row.get('email', '')),
+            8: str(row.get('celular_financeiro', '')),
+            9: str(row.get('status_matricula', '')),
+            10: str(row.get('rematricula_recente', '')),
+            11: str(row.get('data_ultima_rematricula', '')),
+            12: str(row.get('horas_extensao', '')),
+            13: str(row.get('qtde_horas_complementares', '')),
+            14: str(row.get('email_financeiro', '')),
+            15: str(row.get('situacao_academica', '')),
+            16: str(row.get('metodo_processamento', ''))
+        }
+
+    def linha_nomeada(self, dados_aluno, agora=None):
+        """Linha de um único aluno indexada pelos nomes de coluna do CSV (usada na sincronização em fluxo)"""
+        agora = agora or datetime.now().strftime("%d/%m/%Y %H:%M:%S")
+        linha = self._montar_linha(dados_aluno, agora)
+        return {self.nomes_colunas[i]: valor for i, valor in linha.items()}
+
     def salvar_csv(self, nome_arquivo="alunos_coletados.csv"):
         try:
             caminho = Path("resultados") / nome_arquivo
@@ -87,3 +100,93 @@ class DataExporter:
             if self.logger:
                 self.logger.log(f"✗ Erro ao salvar Excel: {e}")
             return None
+
+    def _preparar_dados_tipados(self, data_execucao):
+        """DataFrame com os nomes de campo originais e colunas de data/inteiro tipadas"""
+        df = pd.DataFrame(self.dados)
+        for coluna in self.COLUNAS_DATA:
+            if coluna in df:
+                # Extrai apenas a data (DD/MM/YYYY), ignorando hora ou espaços extras
+                datas = df[coluna].astype(str).str.extract(r'(\d{2}/\d{2}/\d{4})')[0]
+                convertidas = pd.to_datetime(datas, format="%d/%m/%Y", errors='coerce')
+                invalidos = int((self._preenchidos(df[coluna]) & convertidas.isna()).sum())
+                if invalidos and self.logger:
+                    self.logger.log(f"⚠️ Parquet: {invalidos} valor(es) de '{coluna}' não reconhecidos como data")
+                df[coluna] = convertidas
+        for coluna in self.COLUNAS_INTEIRAS:
+            if coluna in df:
+                numeros = pd.to_numeric(
+                    df[coluna].astype(str).str.replace(',', '.').str.extract(r'(\d+(?:\.\d+)?)')[0],
+                    errors='coerce'
+                )
+                fracionarios = numeros.notna() & (numeros % 1 != 0)
+                invalidos = int((self._preenchidos(df[coluna]) & numeros.isna()).sum())
+                if invalidos and self.logger:
+                    self.logger.log(f"⚠️ Parquet: {invalidos} valor(es) de '{coluna}' não reconhecidos como número")
+                if fracionarios.any() and self.logger:
+                    self.logger.log(f"⚠️ Parquet: {int(fracionarios.sum())} valor(es) fracionários de '{coluna}' descartados")
+                df[coluna] = numeros.mask(fracionarios).astype('Int64')
+
+        df['data_atualizacao'] = pd.Timestamp.now().floor('s')
+        df['sistema'] = self.unidade
+        df['data_execucao'] = data_execucao
+        return df
+
+    @staticmethod
+    def _preenchidos(serie):
+        return serie.notna() & (serie.astype(str).str.strip() != '')
+
+    def _schema_parquet(self, df, pa):
+        """Tipos fixos por coluna, independentes dos dtypes do pandas instalado"""
+        campos = []
+        for coluna in df.columns:
+            if coluna in self.COLUNAS_DATA:
+                tipo = pa.date32()
+            elif coluna in self.COLUNAS_INTEIRAS:
+                tipo = pa.int64()
+            elif coluna == 'data_atualizacao':
+                tipo = pa.timestamp('us')
+            else:
+                tipo = pa.string()
+            campos.append(pa.field(coluna, tipo))
+        return pa.schema(campos)
+
+    def salvar_parquet(self, pasta="parquet", data_execucao=None):
+        """
+        Acrescenta a execução a um dataset Parquet particionado em
+        resultados/<pasta>/sistema=<SISTEMA>/data_execucao=<AAAA-MM-DD>/.
+        Execuções anteriores são preservadas (um arquivo por execução).
+        """
+        try:
+            import pyarrow as pa  # dependência opcional, apenas para o export Parquet
+        except ImportError:
+            if self.logger:
+                self.logger.log("✗ Export Parquet requer o pacote 'pyarrow' (pip install pyarrow)")
+            return None
+
+        try:
+            caminho = Path("resultados") / pasta
+            data_execucao = data_execucao or datetime.now().strftime("%Y-%m-%d")
+            df_final = self._preparar_dados_tipados(data_execucao)
+
+            # Schema explícito: mantém os tipos estáveis entre execuções e versões do pandas
+            schema = self._schema_parquet(df_final, pa)
+
+            execucao_id = datetime.now().strftime("%H%M%S%f")
+            df_final.to_parquet(
+                caminho,
+                engine='pyarrow',
+                compression='zstd',
+                index=False,
+                schema=schema,
+                partition_cols=['sistema', 'data_execucao'],
+                basename_template=f"execucao-{execucao_id}-{{i}}.parquet",
+                existing_data_behavior='overwrite_or_ignore'
+            )
+            if self.logger:
+                self.logger.log(f"✓ Dataset Parquet atualizado: {caminho}")
+            return str(caminho)
+        except Exception as e:
+            if self.logger:
+                self.logger.log(f"✗ Erro ao salvar Parquet: {e}")
+            return None
@@ -0,0 +1,268 @@
+import cProfile
+import json
+import sys
+import threading
+import time
+import traceback
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+
+from scraper.parsers import AcademicParser
+
+# Páginas capturadas -> funções do parser que as consomem (usado na reprodução offline)
+PARSERS_POR_PAGINA = {
+    'ficha_academica': ['extrair_dados_pessoais', 'extrair_vinculos_academicos'],
+    'historico': ['extrair_dados_historico'],
+    'financeiro': ['extrair_dados_financeiros'],
+}
+
+
+class _AmostradorPilha:
+    """Amostra periodicamente a pilha da thread principal (formato 'collapsed' de flamegraph)"""
+
+    def __init__(self, intervalo=0.01):
+        self.intervalo = intervalo
+        self.amostras = Counter()
+        self._thread_alvo = threading.main_thread().ident
+        self._parar = threading.Event()
+        self._thread = None
+
+    def iniciar(self):
+        self._parar.clear()
+        self._thread = threading.Thread(target=self._executar, daemon=True)
+        self._thread.start()
+
+    def parar(self):
+        self._parar.set()
+        if self._thread:
+            self._thread.join()
+
+    def _executar(self):
+        while not self._parar.wait(self.intervalo):
+            frame = sys._current_frames().get(self._thread_alvo)
+            pilha = []
+            while frame is not None:
+                codigo = frame.f_code
+                pilha.append(f"{Path(codigo.co_filename).name}:{codigo.co_name}:{frame.f_lineno}")
+                frame = frame.f_back
+            if pilha:
+                self.amostras[";".join(reversed(pilha))] += 1
+
+    def salvar(self, caminho):
+        with open(caminho, "w", encoding="utf-8") as f:
+            for pilha, total in self.amostras.most_common():
+                f.write(f"{pilha} {total}\n")
+
+
+class ScrapingProfiler:
+    """
+    Profiling opcional do orquestrador.
+
+    modo:
+        ''        -> desligado (apenas captura de CPFs lentos, se limite_lento_seg > 0)
+        'amostra' -> amostragem da pilha durante toda a execução
+        'etapas'  -> cProfile por etapa (navegação e chamadas do AcademicParser)
+
+    Quando limite_lento_seg > 0, todo CPF cujo tempo total ultrapassar o limite tem
+    o HTML das páginas, os tempos por etapa e as exceções gravados em disco.
+    """
+
+    MODOS = ('', 'amostra', 'etapas')
+
+    def __init__(self, modo='', limite_lento_seg=0, logger=None, pasta_base="resultados/perfis"):
+        modo = (modo or '').strip().lower()
+        if modo not in self.MODOS:
+            raise ValueError(f"Modo de profiling {modo} não suportado.")
+        self.modo = modo
+        self.limite_lento_seg = limite_lento_seg or 0
+        self.logger = logger
+        self.pasta_base = Path(pasta_base)
+        # Pasta da execução corrente, definida em iniciar_execucao
+        self.pasta = None
+
+        self._amostrador = None
+        self._perfis_etapa = {}
+        self._pilha_perfis = []
+        self._cpf_atual = None
+
+    @property
+    def ativo(self):
+        return bool(self.modo) or self.limite_lento_seg > 0
+
+    def _log(self, mensagem):
+        if self.logger:
+            self.logger.log(mensagem)
+
+    # --- Execução completa ---
+
+    def iniciar_execucao(self):
+        if not self.ativo:
+            return
+        self.pasta = self.pasta_base / datetime.now().strftime("%Y%m%d_%H%M%S_%f")
+        self.pasta.mkdir(parents=True, exist_ok=True)
+        self._log(f"⏱ Profiling ativo (modo: {self.modo or 'somente CPFs lentos'}) em {self.pasta}")
+        if self.modo == 'amostra':
+            self._amostrador = _AmostradorPilha()
+            self._amostrador.iniciar()
+
+    def finalizar_execucao(self):
+        if not self.ativo:
+            return
+        try:
+            if self._amostrador:
+                self._amostrador.parar()
+                caminho = self.pasta / "amostras.collapsed"
+                self._amostrador.salvar(caminho)
+                self._amostrador = None
+                self._log(f"✓ Amostras de pilha salvas: {caminho}")
+
+            for etapa, perfil in self._perfis_etapa.items():
+                caminho = self.pasta / f"etapa_{etapa}.prof"
+                perfil.dump_stats(str(caminho))
+                self._log(f"✓ Perfil da etapa salvo: {caminho}")
+            self._perfis_etapa = {}
+        except Exception as e:
+            self._log(f"✗ Erro ao salvar perfis: {e}")
+
+    # --- Por CPF ---
+
+    def iniciar_cpf(self, cpf):
+        if not self.ativo:
+            return
+        self._cpf_atual = {
+            'cpf': cpf,
+            'inicio': time.perf_counter(),
+            'etapas': [],
+            'paginas': {},
+            'erros': []
+        }
+
+    def registrar_html(self, pagina, html):
+        if self._cpf_atual is not None and self.limite_lento_seg > 0:
+            self._cpf_atual['paginas'][pagina] = html
+
+    def registrar_erro(self, etapa, erro):
+        if self._cpf_atual is not None:
+            self._cpf_atual['erros'].append({
+                'etapa': etapa,
+                'erro': repr(erro),
+                'traceback': "".join(traceback.format_exception(type(erro), erro, erro.__traceback__))
+            })
+
+    def finalizar_cpf(self):
+        if self._cpf_atual is None:
+            return
+        registro, self._cpf_atual = self._cpf_atual, None
+        total = time.perf_counter() - registro['inicio']
+        if self.limite_lento_seg > 0 and total > self.limite_lento_seg and self.pasta:
+            self._salvar_cpf_lento(registro, total)
+
+    def _salvar_cpf_lento(self, registro, total):
+        try:
+            pasta_cpf = self.pasta / "lentos" / str(registro['cpf'])
+            pasta_cpf.mkdir(parents=True, exist_ok=True)
+            for pagina, html in registro['paginas'].items():
+                with open(pasta_cpf / f"{pagina}.html", "w", encoding="utf-8") as f:
+                    f.write(html or '')
+
+            resumo = {
+                'cpf': registro['cpf'],
+                'tempo_total_seg': round(total, 3),
+                'limite_seg': self.limite_lento_seg,
+                'etapas': registro['etapas'],
+                'paginas': sorted(registro['paginas']),
+                'erros': registro['erros']
+            }
+            with open(pasta_cpf / "captura.json", "w", encoding="utf-8") as f:
+                json.dump(resumo, f, ensure_ascii=False, indent=2)
+            self._log(f"⚠️ CPF lento ({total:.1f}s > {self.limite_lento_seg}s) capturado em {pasta_cpf}")
+        except Exception as e:
+            self._log(f"✗ Erro ao capturar CPF lento {registro['cpf']}: {e}")
+
+    # --- Etapas ---
+
+    @contextmanager
+    def etapa(self, nome):
+        if not self.ativo:
+            yield
+            return
+
+        perfil = None
+        if self.modo == 'etapas':
+            # cProfile não aceita perfis aninhados: pausa o da etapa externa
+            if self._pilha_perfis:
+                self._pilha_perfis[-1].disable()
+            perfil = self._perfis_etapa.setdefault(nome, cProfile.Profile())
+            self._pilha_perfis.append(perfil)
+            perfil.enable()
+
+        inicio = time.perf_counter()
+        erro = None
+        try:
+            yield
+        except Exception as e:
+            erro = e
+            self.registrar_erro(nome, e)
+            raise
+        finally:
+            duracao = time.perf_counter() - inicio
+            if perfil:
+                perfil.disable()
+                self._pilha_perfis.pop()
+                if self._pilha_perfis:
+                    self._pilha_perfis[-1].enable()
+            if self._cpf_atual is not None:
+                self._cpf_atual['etapas'].append({
+                    'etapa': nome,
+                    'duracao_seg': round(duracao, 4),
+                    'erro': repr(erro) if erro else None
+                })
+
+
+def reproduzir_captura(pasta_cpf, perfilar=True):
+    """
+    Reexecuta o AcademicParser sobre o HTML capturado de um CPF lento, sem navegador.
+    Páginas salvas no momento de uma falha (<pagina>_erro.html) passam pelos mesmos
+    parsers, mas o resultado só é exibido, sem entrar nos dados retornados.
+    """
+    pasta_cpf = Path(pasta_cpf)
+    dados = {}
+    perfil = cProfile.Profile() if perfilar else None
+
+    paginas = [(pagina, funcoes, True) for pagina, funcoes in PARSERS_POR_PAGINA.items()]
+    paginas += [(f"{pagina}_erro", funcoes, False) for pagina, funcoes in PARSERS_POR_PAGINA.items()]
+
+    for pagina, funcoes, mesclar in paginas:
+        caminho = pasta_cpf / f"{pagina}.html"
+        if not caminho.exists():
+            continue
+        html = caminho.read_text(encoding="utf-8")
+        for nome_funcao in funcoes:
+            funcao = getattr(AcademicParser, nome_funcao)
+            inicio = time.perf_counter()
+            if perfil:
+                perfil.enable()
+            try:
+                resultado = funcao(html)
+            finally:
+                if perfil:
+                    perfil.disable()
+            print(f"{pagina} -> {nome_funcao}: {time.perf_counter() - inicio:.4f}s")
+            if mesclar:
+                dados.update(resultado)
+            else:
+                print(f"  (página de erro) campos extraídos: {resultado}")
+
+    if perfil:
+        perfil.dump_stats(str(pasta_cpf / "reproducao.prof"))
+    return dados
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 2:
+        print("Uso: python -m scraper.profiler resultados/perfis/<execucao>/lentos/<cpf>")
+        sys.exit(1)
+    for campo, valor in reproduzir_captura(sys.argv[1]).items():
+        print(f"{campo}: {valor}")
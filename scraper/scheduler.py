@@ -0,0 +1,199 @@
+import hashlib
+import json
+import math
+from datetime import datetime
+from pathlib import Path
+
+# Grupos de campos rastreados separadamente (cada um com sua própria data de coleta/mudança)
+GRUPOS_CAMPOS = {
+    'vinculos': [
+        'nome', 'matricula', 'status_matricula', 'email', 'unidade_vinculos', 'curso_vinculos',
+        'situacao_vinculos', 'forma_ingresso_vinculos', 'data_matricula', 'ano_ingresso',
+        'periodo_ingresso', 'matriz_curricular'
+    ],
+    'historico': [
+        'rematricula_recente', 'data_ultima_rematricula', 'horas_extensao', 'qtde_horas_complementares'
+    ],
+    'financeiro': [
+        'email_financeiro', 'celular_financeiro', 'situacao_academica', 'data_matricula_conf'
+    ],
+}
+
+FORMATO_DATA = "%Y-%m-%d %H:%M:%S"
+
+
+class RefreshScheduler:
+    """
+    Prioriza a recoleta de CPFs pela expectativa de dados desatualizados.
+
+    Para cada CPF e grupo de campos guarda a última coleta, a última mudança e o
+    número de mudanças observadas. A taxa de mudança estimada de cada grupo dá a
+    probabilidade de o dado já estar desatualizado; CPFs nunca coletados vêm primeiro.
+    """
+
+    # Intervalo (dias) assumido entre mudanças antes de haver histórico suficiente
+    DIAS_ENTRE_MUDANCAS_PADRAO = 90
+    # Espera (dias) após uma tentativa sem dados; dobra a cada nova falha consecutiva
+    DIAS_ESPERA_FALHA = 7
+    # Probabilidade atribuída a grupos nunca coletados de um CPF que já falhou
+    PROB_GRUPO_SEM_COLETA = 0.1
+
+    def __init__(self, caminho_estado="resultados/estado_atualizacao.json",
+                 meses_rematricula=(1, 2, 7, 8), logger=None):
+        self.caminho_estado = Path(caminho_estado)
+        self.meses_rematricula = set(meses_rematricula)
+        self.logger = logger
+        self.estado = {'tempo_medio_cpf_seg': None, 'cpfs': {}}
+        self.carregar()
+
+    def _log(self, mensagem):
+        if self.logger:
+            self.logger.log(mensagem)
+
+    def carregar(self):
+        if not self.caminho_estado.exists():
+            return
+        try:
+            with open(self.caminho_estado, encoding="utf-8") as f:
+                self.estado = json.load(f)
+        except Exception as e:
+            self._log(f"✗ Erro ao carregar estado do agendador ({self.caminho_estado}): {e}")
+
+    def salvar(self):
+        try:
+            self.caminho_estado.parent.mkdir(parents=True, exist_ok=True)
+            temporario = self.caminho_estado.with_suffix(".tmp")
+            with open(temporario, "w", encoding="utf-8") as f:
+                json.dump(self.estado, f, ensure_ascii=False, indent=1)
+            temporario.replace(self.caminho_estado)
+        except Exception as e:
+            self._log(f"✗ Erro ao salvar estado do agendador: {e}")
+
+    # --- Registro de coletas ---
+
+    def registrar(self, dados_aluno, grupos_coletados, duracao_seg=None, agora=None, grupos_tentados=None):
+        """
+        Atualiza o estado de um CPF após a coleta. Grupos tentados (padrão: todos)
+        que não foram coletados contam como falha e têm a prioridade reduzida.
+        """
+        agora = agora or datetime.now()
+        cpf = str(dados_aluno.get('cpf', '')).strip()
+        if not cpf:
+            return
+
+        registro = self.estado['cpfs'].setdefault(cpf, {'grupos': {}, 'sinais': {}})
+        falhas = registro.setdefault('falhas', {})
+        for grupo in (GRUPOS_CAMPOS if grupos_tentados is None else grupos_tentados):
+            if grupo in grupos_coletados:
+                falhas.pop(grupo, None)
+            else:
+                falha = falhas.setdefault(grupo, {'tentativas_sem_dados': 0})
+                falha['tentativas_sem_dados'] += 1
+                falha['ultima_tentativa'] = agora.strftime(FORMATO_DATA)
+
+        for grupo in grupos_coletados:
+            campos = GRUPOS_CAMPOS[grupo]
+            assinatura = hashlib.sha1(
+                "|".join(str(dados_aluno.get(c, '')) for c in campos).encode("utf-8")
+            ).hexdigest()
+
+            info = registro['grupos'].get(grupo)
+            if info is None:
+                info = {
+                    'primeira_coleta': agora.strftime(FORMATO_DATA),
+                    'ultima_mudanca': agora.strftime(FORMATO_DATA),
+                    'mudancas': 0,
+                    'assinatura': assinatura
+                }
+                registro['grupos'][grupo] = info
+            elif info['assinatura'] != assinatura:
+                info['ultima_mudanca'] = agora.strftime(FORMATO_DATA)
+                info['mudancas'] += 1
+                info['assinatura'] = assinatura
+            info['ultima_coleta'] = agora.strftime(FORMATO_DATA)
+
+            # Campos usados como sinais de prioridade
+            for campo in ('rematricula_recente', 'data_matricula_conf'):
+                if campo in campos:
+                    registro['sinais'][campo] = dados_aluno.get(campo, '')
+
+        # Tentativas sem dados (timeouts, CPF inexistente) distorceriam a estimativa de tempo
+        if duracao_seg is not None and grupos_coletados:
+            media = self.estado.get('tempo_medio_cpf_seg')
+            # Média móvel exponencial para estimar quantos CPFs cabem num orçamento de tempo
+            self.estado['tempo_medio_cpf_seg'] = duracao_seg if media is None else 0.9 * media + 0.1 * duracao_seg
+
+    # --- Priorização ---
+
+    def _prob_desatualizado(self, info, agora):
+        primeira = datetime.strptime(info['primeira_coleta'], FORMATO_DATA)
+        ultima = datetime.strptime(info['ultima_coleta'], FORMATO_DATA)
+        dias_observados = max((ultima - primeira).total_seconds() / 86400, 0)
+        dias_sem_coleta = max((agora - ultima).total_seconds() / 86400, 0)
+
+        # Estimativa de Poisson com uma mudança "a priori" no intervalo padrão
+        taxa = (info['mudancas'] + 1) / (dias_observados + self.DIAS_ENTRE_MUDANCAS_PADRAO)
+        return 1 - math.exp(-taxa * dias_sem_coleta)
+
+    def _fator_falha(self, falha, agora):
+        """
+        Redutor de prioridade após tentativas sem dados: 0 logo após a falha, subindo
+        até 1/n ao fim de uma espera que dobra a cada uma das n falhas consecutivas.
+        """
+        if not falha:
+            return 1.0
+        tentativas = falha['tentativas_sem_dados']
+        ultima = datetime.strptime(falha['ultima_tentativa'], FORMATO_DATA)
+        espera = self.DIAS_ESPERA_FALHA * 2 ** (tentativas - 1)
+        return min(max((agora - ultima).total_seconds() / 86400, 0) / espera, 1.0) / tentativas
+
+    def pontuar(self, cpf, agora=None):
+        """Soma, por grupo, a probabilidade de o dado coletado já estar desatualizado"""
+        agora = agora or datetime.now()
+        registro = self.estado['cpfs'].get(str(cpf).strip())
+        if not registro:
+            return math.inf
+
+        sinais = registro.get('sinais', {})
+        pesos = {grupo: 1.0 for grupo in GRUPOS_CAMPOS}
+        if sinais.get('rematricula_recente') == 'NÃO' and agora.month in self.meses_rematricula:
+            pesos['historico'] = 3.0
+        # Só conta como confirmação pendente se a ficha financeira chegou a ser lida
+        if 'data_matricula_conf' in sinais and not sinais['data_matricula_conf']:
+            pesos['financeiro'] = 3.0
+
+        falhas = registro.get('falhas', {})
+        pontuacao = 0.0
+        for grupo, peso in pesos.items():
+            info = registro['grupos'].get(grupo)
+            if info is not None:
+                prob = self._prob_desatualizado(info, agora)
+            else:
+                prob = self.PROB_GRUPO_SEM_COLETA if falhas else 1.0
+            pontuacao += peso * prob * self._fator_falha(falhas.get(grupo), agora)
+        return pontuacao
+
+    def _em_espera(self, cpf, agora):
+        """CPF que nunca retornou dados e ainda está dentro da espera da última falha"""
+        registro = self.estado['cpfs'].get(str(cpf).strip())
+        if not registro or registro['grupos'] or not registro.get('falhas'):
+            return False
+        return all(self._fator_falha(falha, agora) < 1 / falha['tentativas_sem_dados']
+                   for falha in registro['falhas'].values())
+
+    def selecionar(self, cpfs, limite_cpfs=None, limite_tempo_seg=None, agora=None):
+        """Ordena os CPFs por prioridade e corta no orçamento de requisições e/ou tempo"""
+        agora = agora or datetime.now()
+        candidatos = [c for c in dict.fromkeys(cpfs) if not self._em_espera(c, agora)]
+        ordenados = sorted(candidatos, key=lambda c: self.pontuar(c, agora), reverse=True)
+
+        limite = len(ordenados)
+        if limite_cpfs:
+            limite = min(limite, limite_cpfs)
+        tempo_medio = self.estado.get('tempo_medio_cpf_seg')
+        if limite_tempo_seg and tempo_medio:
+            limite = min(limite, max(int(limite_tempo_seg // tempo_medio), 1))
+
+        selecionados = ordenados[:limite]
+        self._log(f"📅 Agendador: {len(selecionados)}/{len(ordenados)} CPFs selecionados por prioridade")
+        return selecionados
@@ -4,66 +4,74 @@ import pandas as pd
 import time
 from datetime import datetime
 import os
+import json
+from pathlib import Path
 from dotenv import load_dotenv
 
-def sincronizar_com_google_sheets():
-    load_dotenv()
-    
-    print("🚀 Iniciando sincronização com Google Sheets...")
-    
-    # 1. MAPEAMENTO DE COLUNAS - Fácil de estender
-    # "nome_coluna_csv": {"coluna_online": número_coluna, "sobrescrever": booleano}
-    mapa_colunas = {
-        "DATA DE ATUALIZAÇÃO": {"coluna_online": 1, "sobrescrever": True},
-        "DATA MATRÍCULA": {"coluna_online": 7, "sobrescrever": False},
-        "CELULAR": {"coluna_online": 12, "sobrescrever": False},
-        "E-MAIL": {"coluna_online": 13, "sobrescrever": False},
-        "SITUAÇÃO ACADÊMICA": {"coluna_online": 26, "sobrescrever": True}, 
-    }
-    
+# 1. MAPEAMENTO DE COLUNAS - Fácil de estender
+# "nome_coluna_csv": {"coluna_online": número_coluna, "sobrescrever": booleano, "nome_online": opcional}
+# "nome_online" é o cabeçalho na planilha quando difere do nome da coluna no CSV
+MAPA_COLUNAS = {
+    "DATA DE ATUALIZAÇÃO": {"coluna_online": 1, "sobrescrever": True},
+    "DATA MATRÍCULA": {"coluna_online": 7, "sobrescrever": False},
+    "CELULAR FINANCEIRO": {"coluna_online": 12, "sobrescrever": False, "nome_online": "CELULAR"},
+    "E-MAIL": {"coluna_online": 13, "sobrescrever": False},
+    "SITUAÇÃO ACADÊMICA": {"coluna_online": 26, "sobrescrever": True}, 
+}
+
+SPREADSHEET_ID = "13XnsZ2he2JUhb78DN5S33rOFhy3Kbz1Q388WL3S_63A"
+ABA_PLANILHA = "Planilha1"
+
+
+def abrir_planilha(log=print):
     # 2. Configurações de Acesso
     scope = ["https://spreadsheets.google.com/feeds", "https://www.googleapis.com/auth/drive"]
     try:
         creds = ServiceAccountCredentials.from_json_keyfile_name('credentials.json', scope)
         client = gspread.authorize(creds)
     except Exception as e:
-        print(f"❌ Erro ao carregar credentials.json: {e}")
-        return
+        log(f"❌ Erro ao carregar credentials.json: {e}")
+        return None
 
     # 3. Abrir a Planilha
-    spreadsheet_id = "13XnsZ2he2JUhb78DN5S33rOFhy3Kbz1Q388WL3S_63A"
     try:
-        sh = client.open_by_key(spreadsheet_id)
-        worksheet = sh.worksheet("Planilha1")
+        sh = client.open_by_key(SPREADSHEET_ID)
+        return sh.worksheet(ABA_PLANILHA)
     except Exception as e:
-        print(f"❌ Erro ao abrir planilha ou aba: {e}")
-        return
+        log(f"❌ Erro ao abrir planilha ou aba: {e}")
+        return None
 
-    # 4. Ler o CSV gerado
-    csv_path = "resultados/alunos_coletados.csv"
-    if not os.path.exists(csv_path):
-        print(f"❌ Arquivo {csv_path} não encontrado. Rode o scraper primeiro.")
-        return
-    
-    df_coletado = pd.read_csv(csv_path)
-    
-    # 5. Obter todos os dados atuais da Planilha Online
+
+def normalizar_cpf(valor):
+    return str(valor).strip().replace('.', '').replace('-', '').replace('/', '')
+
+
+def deve_atualizar(valor_atual, valor_novo, sobrescrever):
+    """Regra de proteção: só preenche células vazias, exceto colunas marcadas para sobrescrever"""
+    return (not valor_atual or sobrescrever) and valor_atual != valor_novo
+
+
+def ler_planilha_online(worksheet, log=print):
+    """Lê a planilha inteira garantindo a coluna 'DATA DE ATUALIZAÇÃO' na Coluna A"""
     dados_online = worksheet.get_all_values()
     
     if not dados_online:
-        print("❌ Planilha online está vazia.")
-        return
+        log("❌ Planilha online está vazia.")
+        return None
 
     # --- INSERÇÃO AUTOMÁTICA DA COLUNA A ---
     header = dados_online[0]
     if header[0] != "DATA DE ATUALIZAÇÃO":
-        print("⚠️ Coluna 'DATA DE ATUALIZAÇÃO' não encontrada na Coluna A. Inserindo...")
+        log("⚠️ Coluna 'DATA DE ATUALIZAÇÃO' não encontrada na Coluna A. Inserindo...")
         worksheet.insert_cols([['DATA DE ATUALIZAÇÃO']], 1)
         # Recarregar dados após alteração estrutural
         dados_online = worksheet.get_all_values()
-        header = dados_online[0]
-        print("✅ Coluna A inserida com sucesso.")
+        log("✅ Coluna A inserida com sucesso.")
+    return dados_online
 
+
+def mapear_colunas(header, log=print):
+    """Retorna (índice da coluna CPF, {coluna_csv: número da coluna online})"""
     # 6. Detectar índice do CPF dinamicamente (Baseado no cabeçalho)
     indice_cpf = -1
     for i, col in enumerate(header):
@@ -72,17 +80,18 @@ def sincronizar_com_google_sheets():
             break
     
     if indice_cpf == -1:
-        print("❌ Não foi possível encontrar a coluna 'CPF' na planilha online.")
-        return
+        log("❌ Não foi possível encontrar a coluna 'CPF' na planilha online.")
+        return -1, {}
     
-    print(f"🔍 Coluna CPF detectada no índice: {indice_cpf} (Coluna {chr(65 + indice_cpf)})")
+    log(f"🔍 Coluna CPF detectada no índice: {indice_cpf} (Coluna {chr(65 + indice_cpf)})")
 
     # 7. Mapear dinamicamente os índices das outras colunas pelo nome
     indices_online_efetivos = {}
-    for coluna_csv, config in mapa_colunas.items():
+    for coluna_csv, config in MAPA_COLUNAS.items():
         encontrou = False
+        nome_online = config.get("nome_online", coluna_csv)
         for i, col_name in enumerate(header):
-            if str(col_name).strip().upper() == str(coluna_csv).strip().upper():
+            if str(col_name).strip().upper() == str(nome_online).strip().upper():
                 indices_online_efetivos[coluna_csv] = i + 1
                 encontrou = True
                 break
@@ -90,17 +99,51 @@ def sincronizar_com_google_sheets():
         if not encontrou:
             # Fallback para o índice fixo (ajustado se houve inserção)
             indices_online_efetivos[coluna_csv] = config["coluna_online"]
-            print(f"⚠️ Coluna '{coluna_csv}' não encontrada pelo nome. Usando índice padrão: {indices_online_efetivos[coluna_csv]}")
+            log(f"⚠️ Coluna '{coluna_csv}' não encontrada pelo nome. Usando índice padrão: {indices_online_efetivos[coluna_csv]}")
         else:
-            print(f"📍 Coluna '{coluna_csv}' mapeada para índice: {indices_online_efetivos[coluna_csv]}")
+            log(f"📍 Coluna '{coluna_csv}' mapeada para índice: {indices_online_efetivos[coluna_csv]}")
+
+    return indice_cpf, indices_online_efetivos
 
+
+def mapear_linhas(dados_online, indice_cpf):
     # 8. Criar mapeamento de linhas por CPF
     mapeamento_linhas = {}
     for i, linha in enumerate(dados_online):
         if len(linha) > indice_cpf:
-            cpf_limpo = str(linha[indice_cpf]).strip().replace('.', '').replace('-', '').replace('/', '')
+            cpf_limpo = normalizar_cpf(linha[indice_cpf])
             if cpf_limpo:
                 mapeamento_linhas[cpf_limpo] = i + 1 
+    return mapeamento_linhas
+
+
+def sincronizar_com_google_sheets():
+    load_dotenv()
+    
+    print("🚀 Iniciando sincronização com Google Sheets...")
+    
+    worksheet = abrir_planilha()
+    if worksheet is None:
+        return
+
+    # 4. Ler o CSV gerado
+    csv_path = "resultados/alunos_coletados.csv"
+    if not os.path.exists(csv_path):
+        print(f"❌ Arquivo {csv_path} não encontrado. Rode o scraper primeiro.")
+        return
+    
+    df_coletado = pd.read_csv(csv_path)
+    
+    # 5. Obter todos os dados atuais da Planilha Online
+    dados_online = ler_planilha_online(worksheet)
+    if not dados_online:
+        return
+
+    indice_cpf, indices_online_efetivos = mapear_colunas(dados_online[0])
+    if indice_cpf == -1:
+        return
+
+    mapeamento_linhas = mapear_linhas(dados_online, indice_cpf)
     
     # 9. Processar cada linha do CSV
     print(f"📊 Total de registros para processar: {len(df_coletado)}")
@@ -108,7 +151,7 @@ def sincronizar_com_google_sheets():
     sucesso = 0
 
     for _, row in df_coletado.iterrows():
-        cpf_csv = str(row.get('CPF', '')).strip().replace('.', '').replace('-', '').replace('/', '')
+        cpf_csv = normalizar_cpf(row.get('CPF', ''))
         
         if not cpf_csv: 
             continue
@@ -118,7 +161,7 @@ def sincronizar_com_google_sheets():
             
             try:
                 # Atualizar cada coluna conforme o mapeamento detectado
-                for coluna_csv, config in mapa_colunas.items():
+                for coluna_csv, config in MAPA_COLUNAS.items():
                     if coluna_csv in row:
                         valor_novo = str(row[coluna_csv]).strip() if pd.notna(row[coluna_csv]) else ""
                         
@@ -134,12 +177,11 @@ def sincronizar_com_google_sheets():
                             valor_atual = str(dados_online[linha_alvo - 1][coluna_online - 1]).strip()
                         
                         # Aplicar regra de proteção
-                        if not valor_atual or sobrescrever:
-                            if valor_atual != valor_novo:
-                                worksheet.update_cell(linha_alvo, coluna_online, valor_novo)
-                                print(f"✅ Linha {linha_alvo}, Coluna {coluna_online} atualizada: {valor_novo}")
-                                time.sleep(0.5)
-                        else:
+                        if deve_atualizar(valor_atual, valor_novo, sobrescrever):
+                            worksheet.update_cell(linha_alvo, coluna_online, valor_novo)
+                            print(f"✅ Linha {linha_alvo}, Coluna {coluna_online} atualizada: {valor_novo}")
+                            time.sleep(0.5)
+                        elif valor_atual and not sobrescrever:
                             print(f"⏭️ Linha {linha_alvo}, Coluna {coluna_online}: Célula já preenchida ({valor_atual}), ignorada")
                 
                 print(f"✅ Registro processado: {cpf_csv}")
@@ -153,5 +195,194 @@ def sincronizar_com_google_sheets():
 
     print(f"\n✨ Sincronização concluída! {sucesso} registros processados.")
 
+
+def _sem_vazios_finais(linha):
+    linha = [str(valor).strip() for valor in linha]
+    while linha and not linha[-1]:
+        linha.pop()
+    return linha
+
+
+class SheetsStreamSync:
+    """
+    Sincronização incremental acoplada ao scraper (sem passar pelo CSV).
+
+    Os alunos concluídos ficam em buffer e são enviados em lotes a cada
+    `intervalo_seg`. Uma cópia local da planilha (relida após `idade_max_snapshot_seg`)
+    evita o get_all_values() a cada execução e fornece o mapeamento de colunas. A cada
+    lote, a coluna CPF e as linhas alvo são lidas da planilha (duas requisições) e só
+    as células alteradas são enviadas.
+    """
+
+    def __init__(self, exporter, logger=None, intervalo_seg=120, idade_max_snapshot_seg=3600,
+                 caminho_snapshot="resultados/planilha_snapshot.json"):
+        self.exporter = exporter
+        self.logger = logger
+        self.intervalo_seg = intervalo_seg
+        self.idade_max_snapshot_seg = idade_max_snapshot_seg
+        self.caminho_snapshot = Path(caminho_snapshot)
+
+        self.worksheet = None
+        self.dados_online = None
+        self.lido_em = 0
+        self.indice_cpf = -1
+        self.indices_online = {}
+        self.mapeamento_linhas = {}
+
+        self.buffer = {}
+        self.ultimo_envio = time.time()
+
+    def _log(self, mensagem):
+        if self.logger:
+            self.logger.log(mensagem)
+        else:
+            print(mensagem)
+
+    # --- Snapshot local ---
+
+    def _carregar_snapshot(self):
+        if not self.caminho_snapshot.exists():
+            return False
+        try:
+            with open(self.caminho_snapshot, encoding="utf-8") as f:
+                snapshot = json.load(f)
+        except Exception as e:
+            self._log(f"⚠️ Snapshot da planilha ilegível, relendo online: {e}")
+            return False
+        if snapshot.get('spreadsheet_id') != SPREADSHEET_ID or time.time() - snapshot.get('lido_em', 0) > self.idade_max_snapshot_seg:
+            return False
+        self._aplicar_dados(snapshot['dados'], snapshot['lido_em'])
+        self._log(f"📦 Snapshot local da planilha carregado ({len(self.dados_online)} linhas)")
+        return True
+
+    def _salvar_snapshot(self):
+        try:
+            self.caminho_snapshot.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.caminho_snapshot, "w", encoding="utf-8") as f:
+                json.dump({'spreadsheet_id': SPREADSHEET_ID, 'lido_em': self.lido_em, 'dados': self.dados_online},
+                          f, ensure_ascii=False)
+        except Exception as e:
+            self._log(f"⚠️ Erro ao salvar snapshot da planilha: {e}")
+
+    def _aplicar_dados(self, dados_online, lido_em):
+        self.dados_online = dados_online
+        self.lido_em = lido_em
+        self.indice_cpf, self.indices_online = mapear_colunas(dados_online[0], log=self._log)
+        self.mapeamento_linhas = mapear_linhas(dados_online, self.indice_cpf) if self.indice_cpf != -1 else {}
+
+    def _reler_planilha(self):
+        dados_online = ler_planilha_online(self.worksheet, log=self._log)
+        if not dados_online:
+            return False
+        self._aplicar_dados(dados_online, time.time())
+        self._salvar_snapshot()
+        self._log(f"🔄 Planilha online relida ({len(dados_online)} linhas)")
+        return True
+
+    def _garantir_planilha(self):
+        if self.worksheet is None:
+            self.worksheet = abrir_planilha(log=self._log)
+            if self.worksheet is None:
+                return False
+        if self.dados_online is None and not self._carregar_snapshot():
+            return self._reler_planilha()
+        if time.time() - self.lido_em > self.idade_max_snapshot_seg:
+            return self._reler_planilha()
+        return True
+
+    # --- Fluxo de registros ---
+
+    def adicionar(self, dados_aluno):
+        """Enfileira um aluno concluído; envia o lote se o intervalo já passou"""
+        cpf = normalizar_cpf(dados_aluno.get('cpf', ''))
+        if not cpf:
+            return
+        self.buffer[cpf] = self.exporter.linha_nomeada(dados_aluno)
+        if time.time() - self.ultimo_envio >= self.intervalo_seg:
+            self.enviar()
+
+    def _linhas_por_cpf_online(self):
+        """Mapa CPF -> linha lido da planilha a cada lote (uma única leitura da coluna CPF)"""
+        coluna_cpf = self.worksheet.col_values(self.indice_cpf + 1)
+        return {normalizar_cpf(valor): i + 1 for i, valor in enumerate(coluna_cpf) if normalizar_cpf(valor)}
+
+    def enviar(self):
+        """
+        Envia o buffer atual em uma única requisição (apenas células alteradas).
+        A cópia local só fornece o cabeçalho; posição das linhas e valores atuais
+        são lidos da planilha a cada lote, para não escrever na linha errada nem
+        sobrescrever células preenchidas online depois da cópia.
+        """
+        self.ultimo_envio = time.time()
+        if not self.buffer:
+            return 0
+        try:
+            if not self._garantir_planilha() or self.indice_cpf == -1:
+                return 0
+
+            self.mapeamento_linhas = self._linhas_por_cpf_online()
+            alvos = {}
+            for cpf in self.buffer:
+                if cpf in self.mapeamento_linhas:
+                    alvos[cpf] = self.mapeamento_linhas[cpf]
+                else:
+                    self._log(f"❓ CPF {cpf} não encontrado na Planilha Online.")
+
+            # Cabeçalho + linhas alvo em uma única leitura
+            faixas = ["1:1"] + [f"{linha}:{linha}" for linha in alvos.values()]
+            leitura = self.worksheet.batch_get(faixas)
+            cabecalho_online = leitura[0][0] if leitura[0] else []
+            if _sem_vazios_finais(cabecalho_online) != _sem_vazios_finais(self.dados_online[0]):
+                # Colunas mudaram desde a cópia local: relê tudo e deixa o lote para a próxima rodada
+                self._log("⚠️ Cabeçalho da planilha mudou desde a cópia local; relendo antes de enviar")
+                self._reler_planilha()
+                return 0
+            linhas_atuais = {cpf: (leitura[i][0] if leitura[i] else []) for i, cpf in enumerate(alvos, 1)}
+
+            celulas = []
+            enviados = []
+            for cpf, linha_alvo in alvos.items():
+                linha_online = linhas_atuais[cpf]
+                # A linha pode ter mudado entre as duas leituras
+                cpf_na_linha = normalizar_cpf(linha_online[self.indice_cpf]) if len(linha_online) > self.indice_cpf else ''
+                if cpf_na_linha != cpf:
+                    self._log(f"⚠️ Linha {linha_alvo} mudou durante o envio; CPF {cpf} fica para o próximo lote")
+                    continue
+
+                registro = self.buffer[cpf]
+                for coluna_csv, config in MAPA_COLUNAS.items():
+                    valor_novo = str(registro.get(coluna_csv, '')).strip()
+                    if not valor_novo or valor_novo.lower() == 'nan':
+                        continue
+                    coluna_online = self.indices_online[coluna_csv]
+                    valor_atual = str(linha_online[coluna_online - 1]).strip() if len(linha_online) >= coluna_online else ""
+                    if deve_atualizar(valor_atual, valor_novo, config["sobrescrever"]):
+                        celulas.append(gspread.Cell(linha_alvo, coluna_online, valor_novo))
+                enviados.append(cpf)
+
+            if celulas:
+                # USER_ENTERED: mesma interpretação de datas/números que o update_cell do sync via CSV
+                self.worksheet.update_cells(celulas, value_input_option='USER_ENTERED')
+
+            # Só depois do envio bem-sucedido: retira do buffer e atualiza a cópia local
+            for celula in celulas:
+                if celula.row <= len(self.dados_online):
+                    linha = self.dados_online[celula.row - 1]
+                    linha.extend([''] * (celula.col - len(linha)))
+                    linha[celula.col - 1] = celula.value
+            for cpf in enviados + [cpf for cpf in list(self.buffer) if cpf not in alvos]:
+                self.buffer.pop(cpf, None)
+            if celulas:
+                self._salvar_snapshot()
+            self._log(f"✅ Sheets: {len(enviados)} registros sincronizados ({len(celulas)} células alteradas)")
+            return len(celulas)
+        except Exception as e:
+            # Mantém o buffer para a próxima tentativa
+            self._log(f"⚠️ Erro ao sincronizar lote com Google Sheets: {e}")
+            return 0
+
+    def fechar(self):
+        self.enviar()
+
 if __name__ == "__main__":
     sincronizar_com_google_sheets()
\ No newline at end of file